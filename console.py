@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# Dev: Tyler Hudson - tkhudson
+# Shared console output helpers for the demo scripts
+"""
+Shared console output helpers for the demo scripts
+"""
+
+import sys
+import time
+
+_ts_cache = [0, ""]
+
+def now_hms():
+    """Return the local time as HH:MM:SS, formatted at most once per second"""
+    second = int(time.time())
+    if _ts_cache[0] != second:
+        _ts_cache[0] = second
+        _ts_cache[1] = time.strftime("%H:%M:%S", time.localtime(second))
+    return _ts_cache[1]
+
+def emit(*lines):
+    """Write a block of lines to stdout in a single write"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
@@ -8,17 +8,66 @@ Coordinates dashboard, devices, and security demonstration
 """
 
 import os
+import re
 import sys
-import subprocess
-import time
+import atexit
+import asyncio
 import webbrowser
-from datetime import datetime
+
+from console import now_hms
+
+# Keep child launches on CPython's vfork() fast path (Linux): no preexec_fn
+# and no user/group/umask changes, so spawn cost does not grow with the size
+# of this process. posix_spawn is not used, since it requires close_fds=False
+_SPAWN_KWARGS = dict(close_fds=True, start_new_session=False)
+
+# One /dev/null descriptor shared by every child's discarded output; it is
+# dup2()'d onto the child's stdio, so close_fds does not affect it
+_DEVNULL_FD = os.open(os.devnull, os.O_WRONLY)
+atexit.register(os.close, _DEVNULL_FD)
+
+async def _probe_port(port, host='localhost', timeout=5.0, interval=0.02):
+    """Wait until a TCP server accepts connections on port, or timeout expires"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            await writer.wait_closed()
+            return True
+        except OSError:
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(interval)
+
+# Simulator log line reporting at least one connected device
+_DEVICES_READY = re.compile(rb"\b[1-9][0-9]* devices initialized")
+
+async def _wait_for_output(stream, pattern, timeout=5.0):
+    """Wait until a line matching pattern appears on stream, or timeout expires"""
+    async def scan():
+        async for line in stream:
+            if pattern.search(line):
+                return True
+        return False
+    
+    try:
+        return await asyncio.wait_for(scan(), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+async def _drain(stream):
+    """Discard the rest of a child's output so its pipe never fills up"""
+    async for _ in stream:
+        pass
 
 class ZeroTrustDemo:
     """Orchestrates the complete zero-trust demonstration"""
     
     def __init__(self):
         self.processes = []
+        self.drain_tasks = []
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         
     def print_banner(self):
@@ -38,18 +87,21 @@ class ZeroTrustDemo:
         print("  🎯 Security engineering discussions")
         print("\n" + "🛡️ " * 20 + "\n")
     
-    def start_dashboard(self):
+    async def start_dashboard(self):
         """Start the dashboard web server"""
         print("🌐 Starting Zero-Trust Dashboard...")
         dashboard_dir = os.path.join(self.base_dir, 'dashboard')
         
         try:
-            process = subprocess.Popen([
-                sys.executable, '-m', 'http.server', '8080'
-            ], cwd=dashboard_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, '-m', 'http.server', '8080',
+                cwd=dashboard_dir, stdout=_DEVNULL_FD, stderr=_DEVNULL_FD,
+                **_SPAWN_KWARGS)
             
             self.processes.append(process)
-            time.sleep(2)
+            if not await _probe_port(8080):
+                print("❌ Dashboard server did not start listening on port 8080")
+                return False
             
             print("✅ Dashboard server started")
             print("🔗 URL: http://localhost:8080")
@@ -67,7 +119,7 @@ class ZeroTrustDemo:
             print(f"❌ Dashboard start failed: {str(e)}")
             return False
     
-    def start_iot_devices(self):
+    async def start_iot_devices(self):
         """Start legitimate IoT device simulation"""
         print("\n📱 Starting IoT Devices...")
         
@@ -80,12 +132,21 @@ class ZeroTrustDemo:
                 
             # Start IoT simulator
             iot_script = os.path.join(self.base_dir, 'device-simulation', 'iot_simulator.py')
-            process = subprocess.Popen([
-                sys.executable, iot_script
-            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, iot_script, cwd=os.path.dirname(iot_script),
+                stdout=_DEVNULL_FD, stderr=asyncio.subprocess.PIPE,
+                **_SPAWN_KWARGS)
             
             self.processes.append(process)
-            time.sleep(2)
+            
+            # The simulator logs to stderr once its devices are connected
+            ready = await _wait_for_output(process.stderr, _DEVICES_READY)
+            self.drain_tasks.append(asyncio.create_task(_drain(process.stderr)))
+            if ready is False:
+                print("❌ IoT simulator exited before its devices were initialized")
+                return False
+            if ready is None:
+                print("⚠️  IoT devices still connecting - telemetry will start shortly")
             
             print("✅ IoT devices started (3 devices sending telemetry)")
             print("📊 Telemetry: Temperature, Humidity, Motion data")
@@ -108,7 +169,7 @@ class ZeroTrustDemo:
         
         input("\n⏸️  Press ENTER when dashboard is open and showing live data...")
     
-    def run_attack_simulation(self):
+    async def run_attack_simulation(self):
         """Run the security attack demonstration"""
         print("\n🚨 STARTING ZERO-TRUST SECURITY DEMONSTRATION")
         print("="*60)
@@ -121,10 +182,12 @@ class ZeroTrustDemo:
         print("\n📊 Watch the dashboard for real-time security alerts!")
         print("="*60)
         
-        # Run the quick attack demo
+        # Run the quick attack demo in-process rather than in a new interpreter
         try:
-            attack_script = os.path.join(self.base_dir, 'quick_attack_demo.py')
-            subprocess.run([sys.executable, attack_script], check=True)
+            if self.base_dir not in sys.path:
+                sys.path.insert(0, self.base_dir)
+            import quick_attack_demo
+            await quick_attack_demo.simulate_attacks()
             
         except Exception as e:
             print(f"⚠️  Attack simulation error: {str(e)}")
@@ -152,7 +215,29 @@ class ZeroTrustDemo:
         print("  🗂️  Remote state management")
         print("  🧹 Easy cleanup with destroy script")
     
-    def cleanup(self):
+    async def wait_for_processes(self):
+        """Wait until a child process exits, printing a heartbeat every minute"""
+        waiters = {asyncio.ensure_future(process.wait()): process for process in self.processes}
+        try:
+            while True:
+                done, _ = await asyncio.wait(waiters, timeout=60, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.print_heartbeat()
+                    continue
+                
+                process = waiters[done.pop()]
+                print(f"\n⚠️  Child process {process.pid} exited with code {process.returncode}")
+                return
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+    
+    def print_heartbeat(self):
+        """Print a status line while the demo keeps running"""
+        timestamp = now_hms()
+        print(f"⏱️  Demo running... {timestamp} - Dashboard: http://localhost:8080")
+    
+    async def cleanup(self):
         """Clean up all processes"""
         print("\n🧹 Cleaning up processes...")
         for process in self.processes:
@@ -160,46 +245,63 @@ class ZeroTrustDemo:
                 process.terminate()
             except:
                 pass
+        for process in self.processes:
+            try:
+                await asyncio.wait_for(process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+            except:
+                pass
+        for task in self.drain_tasks:
+            task.cancel()
         print("✅ Cleanup complete")
     
+    async def start_services(self):
+        """Start the dashboard and IoT devices concurrently"""
+        self.print_banner()
+        
+        dashboard_ok, devices_ok = await asyncio.gather(
+            self.start_dashboard(), self.start_iot_devices())
+        return dashboard_ok and devices_ok
+    
+    async def run_demonstration(self):
+        """Run the attack simulation and keep the demo alive until Ctrl+C"""
+        # Run attack simulation
+        await self.run_attack_simulation()
+        
+        # Show architecture summary
+        self.show_architecture_summary()
+        
+        print("\n🎉 DEMONSTRATION COMPLETE!")
+        print("💼 Your Azure Zero-Trust IoT Dashboard is fully operational")
+        print("📊 Dashboard continues running at http://localhost:8080")
+        print("🔄 IoT devices continue sending telemetry")
+        
+        # Keep running until user stops
+        print("\n⏹️  Press Ctrl+C to end demonstration")
+        try:
+            await self.wait_for_processes()
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("\n🛑 Demonstration ended by user")
+            
+        return True
+    
     def run_full_demo(self):
         """Run the complete demonstration"""
+        # Each phase runs on the same event loop so the child processes stay
+        # attached to it; the blocking prompt runs between phases, off the loop,
+        # so Ctrl+C interrupts it immediately
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
         try:
-            self.print_banner()
-            
-            # Start dashboard
-            if not self.start_dashboard():
-                return False
-                
-            # Start IoT devices  
-            if not self.start_iot_devices():
+            if not loop.run_until_complete(self.start_services()):
                 return False
             
             # Wait for user to view dashboard
             self.wait_for_user_ready()
             
-            # Run attack simulation
-            self.run_attack_simulation()
-            
-            # Show architecture summary
-            self.show_architecture_summary()
-            
-            print("\n🎉 DEMONSTRATION COMPLETE!")
-            print("💼 Your Azure Zero-Trust IoT Dashboard is fully operational")
-            print("📊 Dashboard continues running at http://localhost:8080")
-            print("🔄 IoT devices continue sending telemetry")
-            
-            # Keep running until user stops
-            print("\n⏹️  Press Ctrl+C to end demonstration")
-            try:
-                while True:
-                    time.sleep(60)
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-                    print(f"⏱️  Demo running... {timestamp} - Dashboard: http://localhost:8080")
-            except KeyboardInterrupt:
-                print("\n🛑 Demonstration ended by user")
-                
-            return True
+            return loop.run_until_complete(self.run_demonstration())
             
         except KeyboardInterrupt:
             print("\n🛑 Demo interrupted")
@@ -208,7 +310,17 @@ class ZeroTrustDemo:
             print(f"\n❌ Demo error: {str(e)}")
             return False
         finally:
-            self.cleanup()
+            try:
+                loop.run_until_complete(self.cleanup())
+                # Cancel anything a Ctrl+C left running before closing the loop
+                pending = asyncio.all_tasks(loop)
+                for task in pending:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                asyncio.set_event_loop(None)
+                loop.close()
 
 def main():
     """Main entry point"""
@@ -223,11 +335,9 @@ def main():
             
     except KeyboardInterrupt:
         print("\n🛑 Demo interrupted")
-        demo.cleanup()
     except Exception as e:
         print(f"❌ Fatal error: {str(e)}")
-        demo.cleanup()
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
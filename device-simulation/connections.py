@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# Dev: Tyler Hudson - tkhudson
+# Shared device connection string loader for the device simulators
+# Parses each connections file once per process
+
+"""
+Device connection string loader
+Reads each connections file once and shares the parsed result
+"""
+
+import json
+from functools import lru_cache
+from pathlib import Path
+
+# Optional fast JSON codec, shared with the other device-simulation modules
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def load_connections(path: str = 'device_connections.json') -> dict:
+    """Return the device connection strings in path, parsing each file on first use"""
+    # Cache on the absolute path so a later chdir can't return another file's data
+    return _load_resolved(Path(path).resolve())
+
+@lru_cache(maxsize=None)
+def _load_resolved(path: Path) -> dict:
+    data = path.read_bytes()
+    return orjson.loads(data) if orjson else json.loads(data)
@@ -14,8 +14,10 @@ import json
 import random
 import time
 from datetime import datetime, timezone
+import numpy as np
 from azure.iot.device.aio import IoTHubDeviceClient
 from azure.iot.device import Message
+from connections import load_connections, orjson
 import os
 import logging
 
@@ -23,6 +25,12 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Per-message part of the telemetry JSON, filled in with C-level bytes formatting
+_TELEMETRY_BODY = (
+    b'"timestamp":"%s","temperature":%.2f,"humidity":%.2f,"motion":%s,'
+    b'"batteryLevel":%.1f,"signalStrength":%d,"messageCount":%d'
+)
+
 class ZeroTrustIoTDevice:
     def __init__(self, device_id: str, connection_string: str):
         self.device_id = device_id
@@ -30,89 +38,166 @@ class ZeroTrustIoTDevice:
         self.client = IoTHubDeviceClient.create_from_connection_string(connection_string)
         self.is_connected = False
         self.message_count = 0
+        self._pending: list[Message] = []
+        # Holds at most one tick; a stalled send skips ticks instead of queuing them
+        self.ticks: asyncio.Queue = asyncio.Queue(maxsize=1)
+        
+        # Static parts of every telemetry payload, built once per device
+        self._base_temp = 20.0 if "temp" in device_id.lower() else 25.0
+        self._base_humidity = 45.0 if "humidity" in device_id.lower() else 50.0
+        self._json_prefix = f'{{"deviceId":{json.dumps(device_id)},"deviceType":"sensor",'.encode()
+        self._zone = f"zone-{hash(device_id) % 3 + 1}"
+        self._base_props = {"deviceType": "sensor", "location": self._zone}
+        
+        # Reusable Message objects, one per slot in the pending batch
+        self._msgs: list[Message] = []
+        
+        # Random readings are drawn in bulk and consumed one row per message
+        self._rng = np.random.default_rng()
+        self._refill()
         
     async def connect(self):
         """Establish secure connection to IoT Hub"""
         try:
             await self.client.connect()
             self.is_connected = True
-            logger.info(f"✅ Device {self.device_id} connected securely")
+            logger.info("✅ Device %s connected securely", self.device_id)
         except Exception as e:
-            logger.error(f"❌ Device {self.device_id} connection failed: {e}")
+            logger.error("❌ Device %s connection failed: %s", self.device_id, e)
             
     async def disconnect(self):
         """Disconnect from IoT Hub"""
         try:
             await self.client.disconnect()
             self.is_connected = False
-            logger.info(f"🔌 Device {self.device_id} disconnected")
+            logger.info("🔌 Device %s disconnected", self.device_id)
         except Exception as e:
-            logger.error(f"❌ Device {self.device_id} disconnect failed: {e}")
+            logger.error("❌ Device %s disconnect failed: %s", self.device_id, e)
     
-    def generate_telemetry(self) -> dict:
-        """Generate realistic IoT telemetry data"""
-        base_temp = 20.0 if "temp" in self.device_id.lower() else 25.0
-        base_humidity = 45.0 if "humidity" in self.device_id.lower() else 50.0
-        
-        telemetry = {
-            "deviceId": self.device_id,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "temperature": round(base_temp + random.uniform(-5, 5), 2),
-            "humidity": round(base_humidity + random.uniform(-10, 10), 2),
-            "motion": random.choice([True, False]),
-            "batteryLevel": round(random.uniform(20, 100), 1),
-            "signalStrength": random.randint(-80, -30),
-            "messageCount": self.message_count + 1
-        }
+    def _refill(self, n: int = 256):
+        """Pre-generate the random readings for the next n messages"""
+        rng = self._rng
+        self._temps = (self._base_temp + rng.uniform(-5, 5, n)).tolist()
+        self._hum = (self._base_humidity + rng.uniform(-10, 10, n)).tolist()
+        self._motion = rng.integers(0, 2, n, dtype=bool).tolist()
+        self._batt = rng.uniform(20, 100, n).tolist()
+        self._sig = rng.integers(-80, -29, n).tolist()
+        self._anom = (rng.random(n) < 0.05).tolist()
+        self._cache_idx = 0
+    
+    def generate_telemetry_bytes(self, ts_iso: str) -> tuple:
+        """Generate realistic IoT telemetry data as a JSON payload and optional alert level"""
+        if self._cache_idx >= len(self._temps):
+            self._refill()
+        i = self._cache_idx
+        self._cache_idx += 1
+        
+        temperature = self._temps[i]
+        humidity = self._hum[i]
+        motion = self._motion[i]
+        battery_level = self._batt[i]
+        signal_strength = self._sig[i]
+        message_count = self.message_count + len(self._pending) + 1
         
         # Simulate occasional anomalies for Defender for IoT demo
-        if random.random() < 0.05:  # 5% chance
-            telemetry["anomaly"] = {
-                "type": random.choice(["temperature_spike", "unusual_motion", "low_battery"]),
-                "severity": random.choice(["low", "medium", "high"]),
-                "description": "Simulated anomaly for demo purposes"
+        if self._anom[i]:  # 5% chance
+            telemetry = {
+                "deviceId": self.device_id,
+                "deviceType": "sensor",
+                "timestamp": ts_iso,
+                "temperature": round(temperature, 2),
+                "humidity": round(humidity, 2),
+                "motion": motion,
+                "batteryLevel": round(battery_level, 1),
+                "signalStrength": signal_strength,
+                "messageCount": message_count,
+                "anomaly": {
+                    "type": random.choice(["temperature_spike", "unusual_motion", "low_battery"]),
+                    "severity": random.choice(["low", "medium", "high"]),
+                    "description": "Simulated anomaly for demo purposes"
+                }
             }
-            
-        return telemetry
+            payload = orjson.dumps(telemetry) if orjson else json.dumps(telemetry).encode()
+            return payload, telemetry["anomaly"]["severity"]
+        
+        body = _TELEMETRY_BODY % (
+            ts_iso.encode(), temperature, humidity, b"true" if motion else b"false",
+            battery_level, signal_strength, message_count,
+        )
+        return self._json_prefix + body + b"}", None
     
-    async def send_telemetry(self):
-        """Send telemetry message to IoT Hub"""
+    def enqueue_telemetry(self, ts_iso: str):
+        """Queue a telemetry message to be sent on the next flush"""
         if not self.is_connected:
-            logger.warning(f"⚠️ Device {self.device_id} not connected")
+            logger.warning("⚠️ Device %s not connected", self.device_id)
             return
             
-        try:
-            telemetry = self.generate_telemetry()
-            message = Message(json.dumps(telemetry))
+        payload, alert_level = self.generate_telemetry_bytes(ts_iso)
+        message = self._message_slot(len(self._pending))
+        message.data = payload
+        
+        if alert_level:
+            message.custom_properties["alertLevel"] = alert_level
+        else:
+            message.custom_properties.pop("alertLevel", None)
+        
+        self._pending.append(message)
+    
+    def _message_slot(self, index: int) -> Message:
+        """Return the reusable Message for a batch slot, creating it on first use"""
+        if index == len(self._msgs):
+            message = Message(b"", content_encoding="utf-8", content_type="application/json")
             
             # Add message properties for routing/filtering
-            message.custom_properties["deviceType"] = "sensor"
-            message.custom_properties["location"] = f"zone-{hash(self.device_id) % 3 + 1}"
-            
-            if "anomaly" in telemetry:
-                message.custom_properties["alertLevel"] = telemetry["anomaly"]["severity"]
+            message.custom_properties.update(self._base_props)
+            self._msgs.append(message)
+        return self._msgs[index]
+    
+    def post_tick(self, ts_iso):
+        """Hand the next tick to this device's consumer, replacing any it hasn't taken yet"""
+        try:
+            self.ticks.put_nowait(ts_iso)
+        except asyncio.QueueFull:
+            skipped = self.ticks.get_nowait()
+            self.ticks.put_nowait(ts_iso)
+            if skipped is not None:
+                logger.warning("⚠️ Device %s still sending, skipped tick %s", self.device_id, skipped)
+    
+    async def flush(self):
+        """Send all queued telemetry messages to IoT Hub"""
+        if not self._pending:
+            return
             
-            await self.client.send_message(message)
+        pending, self._pending = self._pending, []
+        
+        # Pipeline the batch over the device's single connection. send_message
+        # only returns once IoT Hub has acknowledged the message, so the slots
+        # are free for reuse after this gather
+        results = await asyncio.gather(
+            *(self.client.send_message(message) for message in pending),
+            return_exceptions=True
+        )
+        
+        for message, result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.error("❌ %s telemetry send failed: %s", self.device_id, result)
+                continue
+                
             self.message_count += 1
-            
-            anomaly_flag = "🚨" if "anomaly" in telemetry else ""
-            logger.info(f"📤 {self.device_id}: Message #{self.message_count} sent {anomaly_flag}")
-            
-        except Exception as e:
-            logger.error(f"❌ {self.device_id} telemetry send failed: {e}")
+            anomaly_flag = "🚨" if "alertLevel" in message.custom_properties else ""
+            logger.info("📤 %s: Message #%d sent %s", self.device_id, self.message_count, anomaly_flag)
 
 class ZeroTrustSimulation:
     def __init__(self):
         self.devices = []
         self.iot_hub_hostname = None
         self.running = False
+        self._consumers = []
         
     def load_connection_strings(self):
         """Load device connection strings from file"""
         try:
-            with open('device_connections.json', 'r') as f:
-                connections = json.load(f)
-                return connections
+            return load_connections()
         except FileNotFoundError:
             logger.error("❌ device_connections.json not found. Run setup script first.")
             return {}
@@ -131,42 +216,77 @@ class ZeroTrustSimulation:
             device_id = f"zero-trust-{device_type}-{i:02d}"
             
             if device_id in connections:
-                device = ZeroTrustIoTDevice(device_id, connections[device_id])
-                await device.connect()
-                self.devices.append(device)
+                self.devices.append(ZeroTrustIoTDevice(device_id, connections[device_id]))
             else:
-                logger.warning(f"⚠️ No connection string for {device_id}")
+                logger.warning("⚠️ No connection string for %s", device_id)
+        
+        # Connect all devices at once so the TLS handshakes overlap; connect()
+        # logs its own failures
+        await asyncio.gather(*(d.connect() for d in self.devices))
+        failed = [d for d in self.devices if not d.is_connected]
+        self.devices = [d for d in self.devices if d.is_connected]
         
-        logger.info(f"✅ {len(self.devices)} devices initialized")
+        # Release the clients of devices that could not connect
+        await asyncio.gather(*(d.client.shutdown() for d in failed), return_exceptions=True)
+        
+        logger.info("✅ %d devices initialized", len(self.devices))
         return len(self.devices) > 0
     
-    async def run_simulation(self, duration_minutes: int = 60, message_interval: int = 30):
+    async def _device_loop(self, device: ZeroTrustIoTDevice, batch_size: int):
+        """Send a device's telemetry for each tick timestamp put on its queue"""
+        while True:
+            ts = await device.ticks.get()
+            if ts is None:
+                await device.flush()
+                return
+                
+            device.enqueue_telemetry(ts)
+            if len(device._pending) >= batch_size:
+                await device.flush()
+    
+    async def run_simulation(self, duration_minutes: int = 60, message_interval: int = 30,
+                             batch_size: int = 1):
         """
         Run the IoT simulation
         
         Args:
             duration_minutes: How long to run simulation
             message_interval: Seconds between messages per device
+            batch_size: Number of intervals to queue before flushing to IoT Hub
         """
         if not await self.setup_devices():
             return
             
+        # One long-lived consumer per device, fed ticks by the loop below
+        self._consumers = [
+            asyncio.create_task(self._device_loop(device, batch_size))
+            for device in self.devices
+        ]
+            
         self.running = True
         start_time = time.time()
         end_time = start_time + (duration_minutes * 60)
         
-        logger.info(f"🚀 Starting zero-trust IoT simulation for {duration_minutes} minutes")
-        logger.info(f"📊 Message interval: {message_interval} seconds")
-        logger.info(f"📈 Max messages per device: {duration_minutes * 60 // message_interval}")
+        logger.info("🚀 Starting zero-trust IoT simulation for %s minutes", duration_minutes)
+        logger.info("📊 Message interval: %s seconds", message_interval)
+        logger.info("📈 Max messages per device: %d", duration_minutes * 60 // message_interval)
         
         try:
+            deadline = time.monotonic()
             while self.running and time.time() < end_time:
-                # Send telemetry from all devices simultaneously
-                tasks = [device.send_telemetry() for device in self.devices]
-                await asyncio.gather(*tasks, return_exceptions=True)
+                # One timestamp per tick, shared by every device
+                ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
+                for device in self.devices:
+                    device.post_tick(ts)
                 
-                # Wait for next interval
-                await asyncio.sleep(message_interval)
+                # Wait for the next interval on an absolute schedule so send
+                # latency does not accumulate as drift
+                deadline += message_interval
+                now = time.monotonic()
+                if now - deadline > message_interval:
+                    logger.warning("⚠️ Simulation fell %.1fs behind schedule, resyncing", now - deadline)
+                    deadline = now
+                await asyncio.sleep(max(0.0, deadline - now))
                 
         except KeyboardInterrupt:
             logger.info("⏹️ Simulation interrupted by user")
@@ -178,11 +298,22 @@ class ZeroTrustSimulation:
         self.running = False
         logger.info("🧹 Cleaning up connections...")
         
+        # Let consumers flush what they have queued, then stop them
         for device in self.devices:
+            device.post_tick(None)
+        if self._consumers:
+            _, still_running = await asyncio.wait(self._consumers, timeout=10)
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*self._consumers, return_exceptions=True)
+            self._consumers = []
+        
+        for device in self.devices:
+            await device.flush()
             await device.disconnect()
             
         total_messages = sum(device.message_count for device in self.devices)
-        logger.info(f"📊 Simulation complete. Total messages sent: {total_messages}")
+        logger.info("📊 Simulation complete. Total messages sent: %d", total_messages)
 
 async def main():
     """Main simulation entry point"""
@@ -191,9 +322,14 @@ async def main():
     
     simulation = ZeroTrustSimulation()
     
+    # Intervals to queue per device before sending them together; the default
+    # of 1 sends every reading as soon as it is taken
+    batch_size = max(1, int(os.environ.get("IOT_BATCH_SIZE", "1")))
+    
     # Run for 30 minutes with 60-second intervals (30 messages per device)
     # Total: 90 messages vs 8000/day limit = very safe
-    await simulation.run_simulation(duration_minutes=30, message_interval=60)
+    await simulation.run_simulation(duration_minutes=30, message_interval=60,
+                                    batch_size=batch_size)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
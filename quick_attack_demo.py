@@ -7,95 +7,116 @@ Quick Attack Demo - Run this in a separate terminal while dashboard is running
 Simulates malicious attacks to demonstrate zero-trust security
 """
 
-import time
+import asyncio
 import random
-from datetime import datetime
+from itertools import accumulate
 
-def print_attack_attempt(attack_name, description, result):
-    """Print formatted attack attempt result"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"\n[{timestamp}] 🎭 {attack_name}")
-    print(f"  📋 {description}")
-    print(f"  🛡️  {result}")
-    print("-" * 60)
+from console import emit, now_hms
 
-def simulate_attacks():
+# Fixed seed so the pause schedule is the same on every run
+PAUSE_SEED = 0
+
+SEP = "-" * 60
+BANNER = "=" * 60
+
+# Attack name, description and result, pre-joined into the printed body
+_ATTACKS = tuple(
+    "\n".join((f"🎭 {name}", f"  📋 {description}", f"  🛡️  {result}"))
+    for name, description, result in (
+        (
+            "Unauthorized Device Connection",
+            "Attempting connection with invalid IoT Hub credentials",
+            "BLOCKED - Authentication failed at IoT Hub gateway"
+        ),
+        (
+            "Credential Brute Force Attack",
+            "Multiple rapid authentication attempts with wrong passwords",
+            "BLOCKED - Rate limiting and account lockout triggered"
+        ),
+        (
+            "Malicious Telemetry Injection",
+            "Attempting to send oversized/malformed telemetry payloads",
+            "BLOCKED - Message validation failed at IoT Hub"
+        ),
+        (
+            "Protocol Violation Attack",
+            "Attempting unauthorized MQTT/HTTP access outside allowed ports",
+            "BLOCKED - Network Security Groups denied access"
+        ),
+        (
+            "Device Identity Spoofing",
+            "Attempting to impersonate legitimate device with fake certificates",
+            "BLOCKED - Certificate validation failed"
+        ),
+        (
+            "Network Reconnaissance",
+            "Port scanning and service discovery attempts",
+            "BLOCKED - VNet isolation prevented internal access"
+        ),
+        (
+            "Data Exfiltration Attempt",
+            "Unauthorized access to device telemetry data streams",
+            "BLOCKED - Azure RBAC denied resource access"
+        ),
+    )
+)
+
+def print_attack_attempt(i, body):
+    """Print a pre-formatted attack attempt result"""
+    emit(
+        f"\n🚨 Attack {i}/{len(_ATTACKS)} in progress...",
+        f"\n[{now_hms()}] {body}",
+        SEP
+    )
+
+async def simulate_attacks():
     """Simulate various attack scenarios"""
-    print("\n" + "="*60)
-    print("🚨 ZERO-TRUST ATTACK SIMULATION STARTING")
-    print("="*60)
-    print("Watch the dashboard at http://localhost:8080 for security alerts!")
-    print("="*60)
+    emit(
+        "\n" + BANNER,
+        "🚨 ZERO-TRUST ATTACK SIMULATION STARTING",
+        BANNER,
+        "Watch the dashboard at http://localhost:8080 for security alerts!",
+        BANNER
+    )
     
-    attacks = [
-        {
-            "name": "Unauthorized Device Connection",
-            "description": "Attempting connection with invalid IoT Hub credentials",
-            "result": "BLOCKED - Authentication failed at IoT Hub gateway"
-        },
-        {
-            "name": "Credential Brute Force Attack", 
-            "description": "Multiple rapid authentication attempts with wrong passwords",
-            "result": "BLOCKED - Rate limiting and account lockout triggered"
-        },
-        {
-            "name": "Malicious Telemetry Injection",
-            "description": "Attempting to send oversized/malformed telemetry payloads",
-            "result": "BLOCKED - Message validation failed at IoT Hub"
-        },
-        {
-            "name": "Protocol Violation Attack",
-            "description": "Attempting unauthorized MQTT/HTTP access outside allowed ports",
-            "result": "BLOCKED - Network Security Groups denied access"
-        },
-        {
-            "name": "Device Identity Spoofing",
-            "description": "Attempting to impersonate legitimate device with fake certificates",
-            "result": "BLOCKED - Certificate validation failed"
-        },
-        {
-            "name": "Network Reconnaissance",
-            "description": "Port scanning and service discovery attempts",
-            "result": "BLOCKED - VNet isolation prevented internal access"
-        },
-        {
-            "name": "Data Exfiltration Attempt",
-            "description": "Unauthorized access to device telemetry data streams",
-            "result": "BLOCKED - Azure RBAC denied resource access"
-        }
-    ]
+    # Draw every pause up front from a seeded generator
+    rng = random.Random(PAUSE_SEED)
+    delays = [rng.uniform(3, 6) for _ in _ATTACKS]
     
-    for i, attack in enumerate(attacks, 1):
-        print(f"\n🚨 Attack {i}/{len(attacks)} in progress...")
-        print_attack_attempt(attack["name"], attack["description"], attack["result"])
-        
-        # Pause between attacks for dramatic effect and dashboard visibility
-        time.sleep(random.uniform(3, 6))
+    async def _run_one(i, attack, offset):
+        # Each attack waits for its cumulative offset, so the pauses still
+        # follow one another and attacks fire in order
+        await asyncio.sleep(offset)
+        print_attack_attempt(i, attack)
     
-    print("\n" + "="*60)
-    print("✅ ALL ATTACKS SUCCESSFULLY BLOCKED")
-    print("🛡️  Zero-Trust Architecture Validation Complete")
-    print("📊 Check dashboard for detailed security monitoring")
-    print("="*60)
+    await asyncio.gather(*[
+        _run_one(i, attack, offset)
+        for i, (attack, offset) in enumerate(zip(_ATTACKS, accumulate(delays)), 1)
+    ])
     
     # Generate some final security summary
-    print(f"\n📈 SECURITY SUMMARY:")
-    print(f"  • Attacks Detected: {len(attacks)}")
-    print(f"  • Attacks Blocked: {len(attacks)}")
-    print(f"  • Success Rate: 100%")
-    print(f"  • Legitimate Devices: Still operating normally")
-    print(f"  • Zero-Trust Status: ✅ ACTIVE")
+    emit(
+        "\n" + BANNER,
+        "✅ ALL ATTACKS SUCCESSFULLY BLOCKED",
+        "🛡️  Zero-Trust Architecture Validation Complete",
+        "📊 Check dashboard for detailed security monitoring",
+        BANNER,
+        "\n📈 SECURITY SUMMARY:",
+        f"  • Attacks Detected: {len(_ATTACKS)}",
+        f"  • Attacks Blocked: {len(_ATTACKS)}",
+        "  • Success Rate: 100%",
+        "  • Legitimate Devices: Still operating normally",
+        "  • Zero-Trust Status: ✅ ACTIVE"
+    )
 
 def main():
     """Main execution"""
-    print("🎯 Quick Attack Demo")
-    print("This script simulates attacks while you watch the dashboard")
+    emit("🎯 Quick Attack Demo", "This script simulates attacks while you watch the dashboard")
     input("\nPress ENTER to start attack simulation (make sure dashboard is open)...")
     
     try:
-        simulate_attacks()
-        print("\n🎉 Demonstration complete!")
-        print("💼 Perfect for portfolio presentations and technical interviews!")
+        asyncio.run(simulate_attacks())
+        emit("\n🎉 Demonstration complete!", "💼 Perfect for portfolio presentations and technical interviews!")
         
     except KeyboardInterrupt:
         print("\n⏹️  Demo interrupted by user")
@@ -7,32 +7,61 @@ Orchestrates attack simulation and dashboard updates for zero-trust validation
 import os
 import sys
 import json
+import atexit
 import time
+import signal
 import asyncio
+import importlib
 import threading
 import subprocess
-from datetime import datetime
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 from typing import Dict, List, Any
 
+from console import emit, now_hms
+
+# One /dev/null descriptor shared by every child's stdio
+_DEVNULL = os.open(os.devnull, os.O_RDWR)
+atexit.register(os.close, _DEVNULL)
+
+# Make device-simulation importable, so attack_simulator and the connections
+# module it imports load through the normal import system and bytecode cache
+_SIM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'device-simulation')
+if _SIM_DIR not in sys.path:
+    sys.path.insert(0, _SIM_DIR)
+
+def _exit_on_signal(signum, frame):
+    """Turn a terminating signal into a normal exit so cleanup handlers run"""
+    sys.exit(128 + signum)
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler that keeps request logs off the demo console"""
+    
+    def log_message(self, format, *args):
+        pass
+
 class SecurityDemoOrchestrator:
     """Orchestrates the security demonstration by running attack simulations and monitoring results"""
     
     def __init__(self):
         self.attack_simulator = None
-        self.dashboard_process = None
+        self.dashboard_server = None
+        self.device_process = None
         self.security_events = []
         self.demo_running = False
         
     def print_banner(self):
         """Display security demonstration banner"""
-        print("\n" + "="*80)
-        print("🛡️  AZURE ZERO-TRUST IoT DASHBOARD - SECURITY DEMONSTRATION")
-        print("="*80)
-        print("This demonstration shows how zero-trust architecture prevents malicious attacks")
-        print("- Phase 1: Normal operations with legitimate devices")
-        print("- Phase 2: Attack simulation showing security blocks")
-        print("- Phase 3: Real-time security monitoring in dashboard")
-        print("="*80 + "\n")
+        emit(
+            "\n" + "="*80,
+            "🛡️  AZURE ZERO-TRUST IoT DASHBOARD - SECURITY DEMONSTRATION",
+            "="*80,
+            "This demonstration shows how zero-trust architecture prevents malicious attacks",
+            "- Phase 1: Normal operations with legitimate devices",
+            "- Phase 2: Attack simulation showing security blocks",
+            "- Phase 3: Real-time security monitoring in dashboard",
+            "="*80 + "\n"
+        )
     
     def start_dashboard(self):
         """Start the dashboard server"""
@@ -40,14 +69,16 @@ class SecurityDemoOrchestrator:
         dashboard_dir = os.path.join(os.path.dirname(__file__), 'dashboard')
         
         try:
-            # Start simple HTTP server for dashboard
-            self.dashboard_process = subprocess.Popen([
-                sys.executable, '-m', 'http.server', '8080'
-            ], cwd=dashboard_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-            time.sleep(2)  # Give server time to start
-            print("✅ Dashboard running at: http://localhost:8080")
-            print("   Open this URL in your browser to see real-time security monitoring\n")
+            # Serve the dashboard from a background thread; the socket is
+            # listening as soon as the server is constructed
+            handler = partial(_QuietHandler, directory=dashboard_dir)
+            self.dashboard_server = ThreadingHTTPServer(('127.0.0.1', 8080), handler)
+            threading.Thread(target=self.dashboard_server.serve_forever, daemon=True).start()
+            
+            emit(
+                "✅ Dashboard running at: http://localhost:8080",
+                "   Open this URL in your browser to see real-time security monitoring\n"
+            )
             return True
             
         except Exception as e:
@@ -58,13 +89,19 @@ class SecurityDemoOrchestrator:
         """Start legitimate device simulation"""
         print("📱 Starting legitimate IoT device simulation...")
         try:
-            subprocess.Popen([
+            # Own session so Ctrl+C here doesn't interrupt the devices mid-handshake.
+            # That also detaches them from the terminal; main() makes sure
+            # cleanup still stops them on exit or hangup
+            self.device_process = subprocess.Popen([
                 sys.executable, 'iot_simulator.py'
-            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            ], stdin=_DEVNULL, stdout=_DEVNULL, stderr=_DEVNULL,
+               close_fds=True, start_new_session=True)
             
             time.sleep(2)
-            print("✅ Legitimate devices are sending telemetry data")
-            print("   Check dashboard to see normal device activity\n")
+            emit(
+                "✅ Legitimate devices are sending telemetry data",
+                "   Check dashboard to see normal device activity\n"
+            )
             return True
             
         except Exception as e:
@@ -73,55 +110,65 @@ class SecurityDemoOrchestrator:
     
     async def run_attack_simulation(self):
         """Run the attack simulation scenarios"""
-        print("🚨 STARTING ATTACK SIMULATION - ZERO-TRUST DEFENSE DEMO")
-        print("-" * 60)
+        emit("🚨 STARTING ATTACK SIMULATION - ZERO-TRUST DEFENSE DEMO", "-" * 60)
         
         # Import and run attack simulator
         try:
-            import importlib.util
-            attack_sim_path = os.path.join(os.path.dirname(__file__), "device-simulation", "attack_simulator.py")
-            spec = importlib.util.spec_from_file_location("attack_simulator", attack_sim_path)
-            attack_simulator = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(attack_simulator)
+            if self.attack_simulator is None:
+                self.attack_simulator = importlib.import_module("attack_simulator")
+            attack_simulator = self.attack_simulator
             
-            simulator = attack_simulator.MaliciousDeviceSimulator()
+            simulator = attack_simulator.MaliciousDeviceSimulator(attack_simulator.load_hub_name())
             
             # Run each attack scenario with explanation
             attack_scenarios = [
-                ("unauthorized_device_connection", "Unauthorized Device Connection"),
-                ("credential_brute_force", "Credential Brute Force Attack"),
-                ("malicious_telemetry_injection", "Malicious Data Injection"),
-                ("protocol_violation", "Protocol Security Violation"),
-                ("device_identity_spoofing", "Device Identity Spoofing")
+                ("scenario_1_unauthorized_device", "Unauthorized Device Connection"),
+                ("scenario_2_credential_brute_force", "Credential Brute Force Attack"),
+                ("scenario_3_malicious_telemetry", "Malicious Data Injection"),
+                ("scenario_4_protocol_violation", "Protocol Security Violation"),
+                ("scenario_5_device_spoofing", "Device Identity Spoofing")
             ]
             
-            for scenario_method, scenario_name in attack_scenarios:
-                print(f"\n🎭 Simulating: {scenario_name}")
-                print(f"   Attempting malicious {scenario_name.lower()}...")
-                
-                # Run the attack scenario
-                try:
-                    method = getattr(simulator, scenario_method)
-                    result = await method()
+            # Run scenarios concurrently, two at a time so dashboard alerts
+            # still arrive in visible waves
+            sem = asyncio.Semaphore(2)
+            
+            async def run_one(scenario_method, scenario_name):
+                async with sem:
+                    lines = [f"\n🎭 Simulating: {scenario_name}", f"   Attempting malicious {scenario_name.lower()}..."]
+                    
+                    # Run the attack scenario, showing its own report above the verdict
+                    result, output = await simulator.run_buffered(getattr(simulator, scenario_method))
+                    lines.append(output.rstrip("\n"))
                     
-                    if result.get('blocked', False):
-                        print(f"   ✅ ATTACK BLOCKED by zero-trust security")
-                        print(f"   🛡️  Protection: {result.get('protection_mechanism', 'Unknown')}")
+                    if result is None:
+                        lines.append("   ⚠️  Attack status: Scenario failed")
+                    elif result.get('blocked', False):
+                        lines.append("   ✅ ATTACK BLOCKED by zero-trust security")
+                        lines.append(f"   🛡️  Protection: {result.get('protection_mechanism', 'Unknown')}")
                     else:
-                        print(f"   ⚠️  Attack status: {result.get('status', 'Unknown')}")
-                        
-                except Exception as e:
-                    print(f"   🛡️  ATTACK BLOCKED: {str(e)}")
-                
-                # Wait between attacks for dashboard visibility
-                print(f"   📊 Check dashboard for security alerts...")
-                time.sleep(8)
+                        lines.append(f"   ⚠️  Attack status: {result.get('status', 'Unknown')}")
+                    
+                    # Print each scenario as one block so concurrent output doesn't interleave
+                    lines.append("   📊 Check dashboard for security alerts...")
+                    emit(*lines)
+                    
+                    # Stagger the next scenario for dashboard visibility
+                    await asyncio.sleep(2)
             
-            print("\n" + "="*60)
-            print("🎯 SECURITY DEMONSTRATION COMPLETE")
-            print("✅ All malicious attacks were blocked by zero-trust architecture")
-            print("📊 Security events visible in dashboard monitoring")
-            print("="*60 + "\n")
+            simulator.open_legitimate_client()
+            try:
+                await asyncio.gather(*(run_one(*scenario) for scenario in attack_scenarios))
+            finally:
+                await simulator.close_legitimate_client()
+            
+            emit(
+                "\n" + "="*60,
+                "🎯 SECURITY DEMONSTRATION COMPLETE",
+                "✅ All malicious attacks were blocked by zero-trust architecture",
+                "📊 Security events visible in dashboard monitoring",
+                "="*60 + "\n"
+            )
             
         except ImportError as e:
             print(f"❌ Error importing attack simulator: {str(e)}")
@@ -132,16 +179,35 @@ class SecurityDemoOrchestrator:
     
     def monitor_security_events(self):
         """Monitor and log security events"""
-        print("🔍 Security monitoring active...")
-        print("   - Monitoring authentication attempts")
-        print("   - Tracking network access patterns") 
-        print("   - Analyzing telemetry for anomalies")
-        print("   - Validating device certificates\n")
+        emit(
+            "🔍 Security monitoring active...",
+            "   - Monitoring authentication attempts",
+            "   - Tracking network access patterns",
+            "   - Analyzing telemetry for anomalies",
+            "   - Validating device certificates\n"
+        )
     
     def cleanup(self):
         """Clean up processes"""
-        if self.dashboard_process:
-            self.dashboard_process.terminate()
+        if self.dashboard_server:
+            self.dashboard_server.shutdown()
+            self.dashboard_server.server_close()
+            self.dashboard_server = None
+        
+        if self.device_process:
+            # The simulator leads its own process group; stop the whole group,
+            # and kill it outright if it doesn't exit in time
+            pgid = self.device_process.pid
+            try:
+                os.killpg(pgid, signal.SIGTERM)
+                try:
+                    self.device_process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    os.killpg(pgid, signal.SIGKILL)
+                    self.device_process.wait()
+            except ProcessLookupError:
+                pass
+            self.device_process = None
             
     async def run_demo(self):
         """Run the complete security demonstration"""
@@ -166,20 +232,28 @@ class SecurityDemoOrchestrator:
             await self.run_attack_simulation()
             
             # Keep running for observation
-            print("🔄 Demonstration continues...")
-            print("   - Legitimate devices still sending telemetry")
-            print("   - Security monitoring remains active") 
-            print("   - Dashboard shows real-time security status")
-            print("\n⏹️  Press Ctrl+C to end demonstration")
+            emit(
+                "🔄 Demonstration continues...",
+                "   - Legitimate devices still sending telemetry",
+                "   - Security monitoring remains active",
+                "   - Dashboard shows real-time security status",
+                "\n⏹️  Press Ctrl+C to end demonstration"
+            )
             
-            # Keep running until interrupted
+            # Keep running until interrupted, without blocking the event loop
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGINT, stop.set)
             try:
-                while True:
-                    time.sleep(30)
-                    print(f"⏱️  Demo running... {datetime.now().strftime('%H:%M:%S')}")
-                    
-            except KeyboardInterrupt:
-                print("\n🛑 Demonstration ended by user")
+                while not stop.is_set():
+                    try:
+                        await asyncio.wait_for(stop.wait(), timeout=30)
+                    except asyncio.TimeoutError:
+                        print(f"⏱️  Demo running... {now_hms()}")
+            finally:
+                loop.remove_signal_handler(signal.SIGINT)
+            
+            print("\n🛑 Demonstration ended by user")
                 
         except Exception as e:
             print(f"❌ Demo error: {str(e)}")
@@ -191,6 +265,11 @@ def main():
     """Main entry point for security demonstration"""
     demo = SecurityDemoOrchestrator()
     
+    # The device simulator runs detached from the terminal, so stop it on any
+    # exit, including a hangup, rather than leaving it sending telemetry
+    atexit.register(demo.cleanup)
+    previous_sighup = signal.signal(signal.SIGHUP, _exit_on_signal)
+    
     try:
         asyncio.run(demo.run_demo())
     except KeyboardInterrupt:
@@ -200,6 +279,8 @@ def main():
         print(f"❌ Fatal error: {str(e)}")
         demo.cleanup()
         sys.exit(1)
+    finally:
+        signal.signal(signal.SIGHUP, previous_sighup)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file